@@ -1,7 +1,10 @@
 from argparse import ArgumentParser
+import hashlib
+import os
 
 from omegaconf import OmegaConf
 from pathlib import Path
+import numpy as np
 import pandas as pd
 
 
@@ -9,17 +12,46 @@ from representative_load_shape.load_profile import (
     create_rls,
 )
 
+# bump when query_ts_data changes the cached frame without changing
+# READ_CSV_KWARGS, so stale parquet caches are not reused
+CACHE_VERSION = 1
+READ_CSV_KWARGS = {
+    'parse_dates': ['Datetime'],
+    'dtype': {'kWh': np.float32, 'service_point': 'category'},
+}
+
 
 def query_ts_data(
         data_dir: str,
         customer_class: str = "Residential",
+        cache_dir: str = None,
 ) -> pd.DataFrame:
     """
     This function queries the time series data, assigns the customer class.
+    If cache_dir is given, the loaded data is cached there as parquet, keyed
+    by the csv path, its modification time, the customer class and how the
+    csv is parsed.
     """
+    if cache_dir is not None:
+        key = hashlib.md5(str((
+            CACHE_VERSION,
+            READ_CSV_KWARGS,
+            data_dir,
+            os.path.getmtime(data_dir),
+            customer_class,
+        )).encode()).hexdigest()
+        cache_path = Path(cache_dir) / f"{key}.parquet"
+        if cache_path.exists():
+            return pd.read_parquet(cache_path)
+
     # Load the data from csv
-    ts_data = pd.read_csv(data_dir)
-    ts_data['customer_class'] = customer_class
+    ts_data = pd.read_csv(data_dir, **READ_CSV_KWARGS)
+    ts_data['customer_class'] = pd.Series(
+        customer_class, index=ts_data.index, dtype='category')
+
+    if cache_dir is not None:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        ts_data.to_parquet(cache_path, compression='zstd')
     return ts_data
 
 
@@ -38,9 +70,10 @@ if __name__ == "__main__":
 
     data = query_ts_data(
         data_dir=conf.data_dir,
-        customer_class=conf.customer_class)
+        customer_class=conf.customer_class,
+        cache_dir=conf.get("cache_dir"))
 
-    data['year'] = pd.to_datetime(data.Datetime).dt.year
+    data['year'] = data.Datetime.dt.year
     data = data[data.year == conf.data.year]
 
     rls = create_rls(
@@ -52,4 +85,6 @@ if __name__ == "__main__":
         pivot_col=conf.data.pivot_col,
         groupby_cols=conf.data.groupby_cols,
         customer_type=conf.customer_class,
+        method=conf.model.barycentre_method,
+        gamma=conf.model.gamma,
     )
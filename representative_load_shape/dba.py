@@ -0,0 +1,125 @@
+import numpy as np
+
+try:
+    from numba import njit, prange
+    HAVE_NUMBA = True
+except ImportError:
+    HAVE_NUMBA = False
+
+    def njit(*args, **kwargs):
+        if args and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+    prange = range
+
+
+@njit(cache=True)
+def _dtw_cost_matrix(
+        x: np.ndarray,
+        y: np.ndarray,
+) -> np.ndarray:
+    """
+    This function computes the cumulative DTW cost matrix of two series.
+    Args:
+        x: First time series with shape (n,)
+        y: Second time series with shape (m,)
+    Returns:
+        Cumulative cost matrix with shape (n + 1, m + 1). The first row and
+        column are padding so the recurrence needs no boundary checks.
+    """
+    n = x.shape[0]
+    m = y.shape[0]
+    cost = np.full((n + 1, m + 1), np.inf)
+    cost[0, 0] = 0.0
+    for i in range(1, n + 1):
+        for j in range(1, m + 1):
+            diff = x[i - 1] - y[j - 1]
+            cost[i, j] = diff * diff + min(
+                cost[i - 1, j - 1], cost[i - 1, j], cost[i, j - 1])
+    return cost
+
+
+@njit(cache=True)
+def _accumulate_path(
+        cost: np.ndarray,
+        y: np.ndarray,
+        sums: np.ndarray,
+        counts: np.ndarray,
+):
+    """
+    This function walks the optimal warping path back from the end of the
+    cost matrix and adds each value of y to the barycentre index it is
+    aligned with.
+    Args:
+        cost: Cumulative cost matrix of the barycentre and y
+        y: Time series aligned to the barycentre
+        sums: Sum of the aligned values for each barycentre index
+        counts: Number of aligned values for each barycentre index
+    """
+    i = cost.shape[0] - 1
+    j = cost.shape[1] - 1
+    while i > 0 and j > 0:
+        sums[i - 1] += y[j - 1]
+        counts[i - 1] += 1.0
+        diagonal = cost[i - 1, j - 1]
+        up = cost[i - 1, j]
+        left = cost[i, j - 1]
+        if diagonal <= up and diagonal <= left:
+            i -= 1
+            j -= 1
+        elif up <= left:
+            i -= 1
+        else:
+            j -= 1
+
+
+@njit(parallel=True, cache=True)
+def _dba_update(
+        X: np.ndarray,
+        barycentre: np.ndarray,
+):
+    """
+    This function runs one DBA update of the barycentre.
+    Args:
+        X: Time series with shape (n_series, sz)
+        barycentre: Current barycentre with shape (sz,)
+    Returns:
+        The updated barycentre and the mean DTW cost of the current one.
+    """
+    n_series, sz = X.shape
+    sums = np.zeros((n_series, barycentre.shape[0]))
+    counts = np.zeros((n_series, barycentre.shape[0]))
+    costs = np.zeros(n_series)
+    for k in prange(n_series):
+        cost = _dtw_cost_matrix(barycentre, X[k])
+        costs[k] = cost[barycentre.shape[0], sz]
+        _accumulate_path(cost, X[k], sums[k], counts[k])
+    return sums.sum(axis=0) / counts.sum(axis=0), costs.mean()
+
+
+def dba_numba(
+        X: np.ndarray,
+        max_iter: int = 30,
+        tol: float = 1e-5,
+) -> np.ndarray:
+    """
+    This function computes the DTW barycentre averaging (DBA) of the time
+    series with numba compiled kernels.
+    Args:
+        X: Time series with shape (n_series, sz)
+        max_iter: Maximum number of DBA updates
+        tol: Stop when the mean DTW cost decreases by less than tol
+    Returns:
+        The barycentre with shape (sz,)
+    """
+    X = np.ascontiguousarray(X, dtype=np.float64)
+    barycentre = X.mean(axis=0)
+    cost_prev = np.inf
+    for _ in range(max_iter):
+        new_barycentre, cost = _dba_update(X, barycentre)
+        if cost_prev - cost < tol:
+            break
+        barycentre = new_barycentre
+        cost_prev = cost
+    return barycentre
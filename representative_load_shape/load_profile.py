@@ -1,14 +1,20 @@
-from typing import List
+from typing import List, Tuple
 
 import pandas as pd
 import numpy as np
+from joblib import Parallel, delayed
 from tslearn.barycenters import (
-    euclidean_barycenter,
     dtw_barycenter_averaging,
     dtw_barycenter_averaging_subgradient,
     softdtw_barycenter,
 )
 
+from representative_load_shape.dba import HAVE_NUMBA, dba_numba
+
+NS_PER_HOUR = 3_600_000_000_000
+NS_PER_DAY = 24 * NS_PER_HOUR
+SEASONS = ['spring', 'summer', 'fall', 'winter']
+
 
 def create_rls(
         ts_data: pd.DataFrame,
@@ -21,6 +27,9 @@ def create_rls(
         percentile: float = 0.95,
         normalize: bool = False,
         customer_type: str = 'residential',
+        method: str = "euclidean",
+        gamma: float = 0.4,
+        n_jobs: int = -1,
 ) -> pd.DataFrame:
     """
     This function creates the representative load shape.
@@ -31,6 +40,10 @@ def create_rls(
         percentile: value at percentile to replace outliers
         normalize: Whether to normalize the load
         customer_type: Customer type (residential, commercial, industrial)
+        method: method of computing the typical representation.
+        gamma: regularization parameter for softdtw.
+        n_jobs: Number of jobs computing the non euclidean centroids of the
+            groups in parallel (-1 uses all cores).
     returns:
         Dataframe with the representative load shape with shape (9870,2)
     """
@@ -43,27 +56,53 @@ def create_rls(
         percentile=percentile,
         normalize=normalize
     )
-    centroids = grouped_data.apply(
-        lambda group: calculate_barycentre(
-            ts_data=group['hour_values'].values,
-            method="euclidean")
-    )
-    centroids = centroids.reset_index()
-    centroids = centroids.rename(columns={0: 'kwh'})
+    hour_columns = [f'hour{hour}' for hour in range(24)]
+    if method == "euclidean":
+        # the euclidean barycentre is the mean of each hour
+        centroids = grouped_data[hour_columns].mean().reset_index()
+        centroids['kwh'] = list(centroids[hour_columns].to_numpy())
+        centroids = centroids.drop(columns=hour_columns)
+    else:
+        groups = list(grouped_data)
+        barycentres = Parallel(n_jobs=n_jobs)(
+            delayed(calculate_barycentre)(
+                ts_data=group[hour_columns].to_numpy(),
+                method=method,
+                gamma=gamma)
+            for _, group in groups
+        )
+        centroids = pd.DataFrame(
+            [
+                (*key, barycentre)
+                for (key, _), barycentre in zip(groups, barycentres)
+            ],
+            columns=[*groupby_cols, 'kwh'])
 
-    results = pd.DataFrame(columns=['time', 'kwh'])
-    delta = pd.Timedelta(days=1)
-    current_date = start_date
+    lookup = build_centroid_lookup(
+        centroids_df=centroids,
+        customer_type=customer_type)
+    # centroids indexed by (season code, weekend code)
+    table = np.zeros((len(SEASONS), 2, 24))
+    available = np.zeros((len(SEASONS), 2), dtype=bool)
+    for (season, weekend), kwh in lookup.items():
+        table[SEASONS.index(season), int(weekend)] = kwh
+        available[SEASONS.index(season), int(weekend)] = True
 
-    while current_date <= end_date:
-        current_result = pd.DataFrame(fill_load_timeseries(
-            centroids_df=centroids,
-            start_date=current_date,
-            customer_type=customer_type)).reset_index()
-        current_result.columns = ['time', 'kwh']
-        results = pd.concat([results, current_result], ignore_index=True)
-        current_date += delta
-    return results
+    # build the hourly index for the whole period once and look up the
+    # centroid of each day by its season and day type
+    time_index = pd.date_range(
+        start=start_date,
+        end=end_date + pd.Timedelta(days=1) - pd.Timedelta(hours=1),
+        freq='H')
+    days = time_index[::24]
+    season_codes = pd.Categorical(
+        seasons_for(days.month.values), categories=SEASONS).codes
+    weekend_codes = np.isin(days.dayofweek, [5, 6]).astype(np.int8)
+    if not available[season_codes, weekend_codes].all():
+        raise ValueError(
+            f"No centroid for some seasons or day types of {customer_type}")
+    kwh = table[season_codes, weekend_codes].reshape(-1)
+    return pd.DataFrame({'time': time_index, 'kwh': kwh})
 
 
 def prepare_data_for_rls(
@@ -89,33 +128,57 @@ def prepare_data_for_rls(
         Dataframe with the time series data for each group.
     """
     ts_data = ts_data.rename(columns={'kWh': 'load'})
-    # round time to the nearest hour
-    ts_data['rounded_time'] = ts_data['time'].dt.round('H')
+    # round time to the nearest hour, with half hours rounded up
+    ts_data['rounded_time'] = (
+        ts_data['time'] + pd.Timedelta(minutes=30)).dt.floor('H')
     if normalize:
         ts_data = normalize_load(ts_data)
     hourly_sum = ts_data.groupby(
-        list(hourly_sum_cols))['load'].sum().reset_index()
+        list(hourly_sum_cols), observed=True)['load'].sum().reset_index()
     hourly_sum.rename(columns={'rounded_time': 'time'}, inplace=True)
-    hourly_sum['date'] = hourly_sum['time'].dt.date
-    hourly_sum['weekend'] = hourly_sum['time'].dt.dayofweek.isin([5, 6])
-    hourly_sum['hour'] = hourly_sum['time'].dt.hour
-    hourly_sum = hourly_sum.groupby('service_point').apply(
-        replace_outliers, percentile=percentile).reset_index(drop=True)
+    hourly_sum['date'], hourly_sum['weekend'], hourly_sum['hour'] = (
+        date_weekend_hour(hourly_sum['time']))
+    # clip each service point's load at its percentile
+    load_threshold = hourly_sum.groupby(
+        'service_point', observed=True)['load'].transform(
+        'quantile', percentile)
+    hourly_sum['load'] = np.minimum(hourly_sum['load'], load_threshold)
 
-    data = hourly_sum.pivot(
+    data = hourly_sum.pivot_table(
         index=index_cols,
         columns=pivot_col,
-        values='load').reset_index()
-    data.fillna(0, inplace=True)
+        values='load',
+        aggfunc='sum',
+        fill_value=0,
+        observed=True).reset_index()
     data.columns = index_cols + [f'hour{hour}' for hour in range(24)]
-    hour_columns = ['hour' + str(i) for i in range(24)]
-    # Use the apply function to create arrays for each row
-    data['hour_values'] = data.apply(
-        lambda row: row[hour_columns].values.tolist(), axis=1)
-    grouped = data.groupby(list(groupby_cols))
+    grouped = data.groupby(list(groupby_cols), observed=True)
     return grouped
 
 
+def date_weekend_hour(
+        time: pd.Series,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    This function derives the date, day type and hour of timestamps in one
+    pass over their epoch nanoseconds. Timezone aware timestamps use their
+    local wall clock time.
+    Args:
+        time: datetime like column
+    Returns:
+        Date (datetime64 at midnight), weekend flag and hour (int8) arrays.
+    """
+    if time.dt.tz is not None:
+        time = time.dt.tz_localize(None)
+    ns = time.to_numpy(dtype='datetime64[ns]').view('i8')
+    days = ns // NS_PER_DAY
+    # 1970-01-01 was a Thursday, so the day of week is (days + 3) % 7
+    date = (days * NS_PER_DAY).view('datetime64[ns]')
+    weekend = (days + 3) % 7 >= 5
+    hour = ((ns // NS_PER_HOUR) % 24).astype(np.int8)
+    return date, weekend, hour
+
+
 def replace_outliers(
         service_point_ts: pd.DataFrame,
         percentile: float = 0.95,
@@ -149,10 +212,12 @@ def normalize_load(
     Returns:
         Dataframe with the normalized time series data.
     """
-    load_max = ts_data['load'].max()
-    ts_data['normalized_load'] = (
-        ts_data['load'] / load_max
-    )
+    normalized_load = ts_data['load'].to_numpy(dtype=np.float32, copy=True)
+    if normalized_load.size:
+        load_max = np.nanmax(normalized_load)
+        if load_max != 0:
+            normalized_load /= load_max
+    ts_data['normalized_load'] = normalized_load
     return ts_data
 
 
@@ -170,10 +235,13 @@ def calculate_barycentre(
             (closer to true DTW).
 
     Returns:
-        The centroid representation of the samples. Array shape (24, 1)
+        The centroid representation of the samples. Array shape (24,)
     """
     if method == "euclidean":
-        centroid = euclidean_barycenter(ts_data)
+        # the euclidean barycentre is the mean of each time step
+        return np.stack(list(ts_data)).mean(axis=0)
+    elif method == "dtw" and HAVE_NUMBA:
+        return dba_numba(np.stack(list(ts_data)))
     elif method == "dtw":
         centroid = dtw_barycenter_averaging(ts_data)
     elif method == "dtw_subgradient":
@@ -185,6 +253,27 @@ def calculate_barycentre(
     return centroid.transpose()[0]
 
 
+def build_centroid_lookup(
+        centroids_df: pd.DataFrame,
+        customer_type: str = 'residential',
+) -> dict:
+    """
+    This function indexes the centroids of a customer type by season and
+    weekend.
+    Args:
+        centroids_df: The centroids for each group.
+        customer_type: Customer type (residential, commercial, industrial)
+    Returns:
+        Dictionary mapping (season, weekend) to the 24 hour centroid.
+    """
+    customer_centroids = centroids_df[
+        centroids_df['customer_class'] == customer_type]
+    return {
+        (row.season, row.weekend): np.asarray(row.kwh)
+        for row in customer_centroids.itertuples()
+    }
+
+
 def fill_load_timeseries(
         centroids_df: pd.DataFrame,
         start_date: pd.Timestamp,
@@ -218,6 +307,24 @@ def fill_load_timeseries(
     return ts
 
 
+def seasons_for(months: np.ndarray) -> np.ndarray:
+    """
+    This function maps an array of months to seasons.
+    Args:
+        months: Array of months (1-12)
+    Returns:
+        Array of seasons (spring, summer, fall, winter)
+    """
+    return np.select(
+        [
+            (months >= 3) & (months <= 5),
+            (months >= 6) & (months <= 8),
+            (months >= 9) & (months <= 11),
+        ],
+        ['spring', 'summer', 'fall'],
+        default='winter')
+
+
 def get_season(month):
     if 3 <= month <= 5:
         return "spring"
@@ -248,16 +355,18 @@ def scale_load(
         Load curve scaled based on the seasonal peaks
     """
     if scale_for_season:
-        season_curve = load_profile.copy()
-        season_curve.loc[~season_curve.index.month.isin(season_months)] = 0.0
-        season_max = season_curve.max()
-        normalized_season_load = season_curve / season_max
-        scaled_curve = normalized_season_load * desired_peak
-        scaled_curve.loc[~scaled_curve.index.month.isin(season_months)] = (
-            load_profile.loc[~scaled_curve.index.month.isin(season_months)]
-        )
+        load = load_profile.to_numpy()
+        in_season = np.isin(load_profile.index.month, season_months)
+        # fmax skips missing readings like the pandas max of the yearly branch
+        season_max = np.fmax.reduce(load, where=in_season, initial=0.0)
+        # scale with a single multiply, then restore the off season load
+        scaled = load * (desired_peak / season_max)
+        np.copyto(scaled, load, where=~in_season)
+        scaled_curve = pd.Series(
+            scaled,
+            index=load_profile.index,
+            name=load_profile.name)
     else:
         year_max = load_profile.max()
-        normalized_year_load = load_profile / year_max
-        scaled_curve = normalized_year_load * desired_peak
+        scaled_curve = load_profile * (desired_peak / year_max)
     return scaled_curve
@@ -0,0 +1,23 @@
+import numpy as np
+import pytest
+from tslearn.barycenters import dtw_barycenter_averaging
+from tslearn.metrics import dtw
+
+from representative_load_shape.dba import _dtw_cost_matrix, dba_numba
+
+
+@pytest.mark.parametrize("n, m", [(24, 24), (37, 50), (50, 37), (17, 5)])
+def test_dtw_cost_matrix_matches_tslearn(n, m):
+    rng = np.random.default_rng(0)
+    x = rng.random(n)
+    y = rng.random(m)
+    cost = _dtw_cost_matrix(x, y)
+    assert cost.shape == (n + 1, m + 1)
+    np.testing.assert_allclose(cost[-1, -1], dtw(x, y) ** 2)
+
+
+def test_dba_numba_matches_tslearn():
+    rng = np.random.default_rng(1)
+    X = rng.random((60, 24)) + np.sin(np.linspace(0, 6, 24))
+    np.testing.assert_allclose(
+        dba_numba(X), dtw_barycenter_averaging(X).ravel(), atol=1e-10)
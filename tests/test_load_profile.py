@@ -0,0 +1,22 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from representative_load_shape.load_profile import date_weekend_hour
+
+
+@pytest.mark.parametrize("start, tz", [
+    ("2001-03-05", None),
+    ("1969-12-27", None),
+    ("1900-02-24 13:00", None),
+    ("2001-03-28", "America/Chicago"),
+])
+def test_date_weekend_hour_matches_dt_accessors(start, tz):
+    time = pd.Series(pd.date_range(start, periods=24 * 8, freq='h', tz=tz))
+    date, weekend, hour = date_weekend_hour(time)
+    local_time = time.dt.tz_localize(None) if tz else time
+    np.testing.assert_array_equal(
+        date, local_time.dt.normalize().to_numpy())
+    np.testing.assert_array_equal(
+        weekend, time.dt.dayofweek.isin([5, 6]).to_numpy())
+    np.testing.assert_array_equal(hour, time.dt.hour.to_numpy())